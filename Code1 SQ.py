@@ -1,32 +1,42 @@
 # Import required scientific computing packages  
 # A units-and-constants package is needed: http://pypi.python.org/pypi/numericalunits  
 import numpy as np  
-import scipy.interpolate, scipy.integrate, pandas, sys  
+import scipy.integrate, sys, os, functools  
 assert sys.version_info >= (3,6), 'Requires Python 3.6+'  
   
 # Import physical constants and units from custom package  
 from numericalunits import W, K, nm, m, cm, s, eV, meV, V, mA, c0, hPlanck, kB, e  
 Tcell = 300 * K  # Standard operating temperature for solar cells (300K)  
   
-# Load AM1.5G solar spectrum data from Excel file  
-worksheet = pandas.read_excel('AM 1.5G.xls')  
-downloaded_array = np.array(worksheet)  
-  
-# Extract wavelength (column 0) and spectral irradiance (column 2)  
-AM15 = downloaded_array[1:, [0,2]]  
+# Invariant combinations of constants, computed once  
+HC = hPlanck * c0  # Converts between photon energy and wavelength  
+KT = kB * Tcell  # Thermal energy  
+INV_KT = 1.0 / KT  
+VT = KT / e  # Thermal voltage (~25.85 mV); eV/kT = V/VT  
+PLANCK_PREFACTOR = (2 * np.pi) / (c0**2 * hPlanck**3)  # Detailed-balance prefactor of RR0  
+  
+# Load AM1.5G solar spectrum data. The Excel file is parsed only when the .npy cache is  
+# missing or older than it; the cache holds plain nm and W/m²/nm values because  
+# numericalunits draws new unit scales on every run  
+if os.path.exists('AM15.npy') and (not os.path.exists('AM 1.5G.xls')  
+                                   or os.path.getmtime('AM15.npy') >= os.path.getmtime('AM 1.5G.xls')):  
+    AM15_raw = np.load('AM15.npy')  
+else:  
+    import pandas  
+    worksheet = pandas.read_excel('AM 1.5G.xls')  
+    downloaded_array = np.array(worksheet)  
+    # Extract wavelength (column 0) and spectral irradiance (column 2)  
+    AM15_raw = downloaded_array[1:, [0,2]].astype(np.float64)  
+    np.save('AM15.npy', AM15_raw)  
   
 # Convert units: wavelength to nm, irradiance to W/m²/nm  
-AM15[:,0] *= nm  
-AM15[:,1] *= W / m**2 / nm  
+AM15 = AM15_raw * np.array([nm, W / m**2 / nm])  
   
 # Define wavelength range for analysis (280-4000nm)  
 λ_min = 280 * nm  # Minimum wavelength (UV cutoff)  
 λ_max = 4000 * nm  # Maximum wavelength (IR cutoff)  
-E_min = hPlanck * c0 / λ_max  # Convert to minimum photon energy  
-E_max = hPlanck * c0 / λ_min  # Convert to maximum photon energy  
-  
-# Create interpolation function for solar spectrum  
-AM15interp = scipy.interpolate.interp1d(AM15[:,0], AM15[:,1])  
+E_min = HC / λ_max  # Convert to minimum photon energy  
+E_max = HC / λ_min  # Convert to maximum photon energy  
   
 # Function to calculate photon flux per unit energy interval  
 def SPhotonsPerTEA(Ephoton):  
@@ -36,14 +46,62 @@ def SPhotonsPerTEA(Ephoton):
     Returns: 
         Photon flux density in m⁻²·s⁻¹·eV⁻¹ 
     """  
-    λ = hPlanck * c0 / Ephoton  # Convert energy to wavelength  
-    return AM15interp(λ) * (1 / Ephoton) * (hPlanck * c0 / Ephoton**2)  
+    # np.interp would silently clamp outside the table; reject it as interp1d did. The check  
+    # is done on energies so that E_min and E_max themselves are never off by round-off  
+    if np.any((Ephoton < HC / AM15[-1,0]) | (Ephoton > HC / AM15[0,0])):  
+        raise ValueError('Photon energy outside the tabulated AM1.5G range')  
+    λ = HC / Ephoton  # Convert energy to wavelength  
+    return np.interp(λ, AM15[:,0], AM15[:,1]) * HC / Ephoton**3  
   
 # Function to calculate power per unit energy interval  
 PowerPerTEA = lambda E : E * SPhotonsPerTEA(E)  # Power density in W/m²/eV  
   
-# Calculate total solar constant (integrated power density)  
-solar_constant = scipy.integrate.quad(PowerPerTEA,E_min,E_max, full_output=1)[0]  
+# Restrict the table to the analysis range [λ_min, λ_max], with interpolated end points,  
+# so the integrals below cover exactly that range whatever span the file has  
+assert AM15[0,0] <= λ_min and AM15[-1,0] >= λ_max, 'AM1.5G table must cover 280-4000nm'  
+inside = (AM15[:,0] > λ_min) & (AM15[:,0] < λ_max)  
+AM15_λ = np.concatenate([[λ_min], AM15[inside,0], [λ_max]])  
+AM15_S = np.interp(AM15_λ, AM15[:,0], AM15[:,1])  
+  
+# Cumulative photon flux integrated on the tabulated AM1.5G wavelengths themselves,  
+# with dΦ/dλ = S(λ)·λ/(hc); the flux above a bandgap is then one lookup at λ = hc/Egap  
+photons_per_λ = AM15_S * AM15_λ / HC  
+cum_phi = scipy.integrate.cumulative_trapezoid(photons_per_λ, AM15_λ, initial=0)  
+  
+# Calculate total solar constant (integrated power density) with the same rule on the  
+# same grid, so it is consistent with the photon flux integrals  
+solar_constant = scipy.integrate.trapezoid(AM15_S, AM15_λ)  
+  
+# Cumulative Planck integral from each grid energy up to E_max, tabulated once in the  
+# dimensionless x = E/kT: ∫E²/(exp(E/kT)-1) dE = (kT)³ ∫x²/(exp(x)-1) dx  
+x_grid = np.linspace(E_min, E_max, 8192) * INV_KT  
+planck_x = x_grid**2 / np.expm1(x_grid)  
+cum_planck = -scipy.integrate.cumulative_trapezoid(planck_x[::-1], x_grid[::-1], initial=0)[::-1]  # Right-to-left  
+  
+def photons_and_RR0_vec(Egap_arr):  
+    """Calculate photon flux above bandgap and radiative recombination rate for an array of bandgaps. 
+    Args: 
+        Egap_arr: Array of bandgap energies in eV 
+    Returns: 
+        Arrays of integrated photon fluxes and recombination rates, both in m⁻²·s⁻¹ 
+    """  
+    Egap_arr = np.asarray(Egap_arr, dtype=np.float64)  
+    # The tables only cover [E_min, E_max]; np.interp would silently clamp outside it  
+    if np.any((Egap_arr < E_min) | (Egap_arr > E_max)):  
+        raise ValueError('Bandgap outside the tabulated range [E_min, E_max]')  
+    flux = np.interp(HC / Egap_arr, AM15_λ, cum_phi)  # Photons with λ below hc/Egap  
+    planck = np.interp(Egap_arr * INV_KT, x_grid, cum_planck)  
+    return flux, PLANCK_PREFACTOR * KT**3 * planck  # Prefactor from detailed balance  
+  
+# Both integrals for a single bandgap, memoized for the most recent bandgaps: a miss is  
+# only two table lookups, so the cache just saves repeats within one scalar calculation  
+@functools.lru_cache(maxsize=128)  
+def _photons_and_RR0_cached(Egap):  
+    flux, rr0 = photons_and_RR0_vec(np.atleast_1d(Egap))  
+    return flux[0], rr0[0]  
+  
+def photons_and_RR0(Egap):  
+    return _photons_and_RR0_cached(float(Egap))  # float() keys the cache and accepts 0-d arrays  
   
 # Function to calculate integrated photon flux above bandgap  
 def solar_photons_above_gap(Egap):  
@@ -53,7 +111,7 @@ def solar_photons_above_gap(Egap):
     Returns: 
         Integrated photon flux in m⁻²·s⁻¹ 
     """  
-    return scipy.integrate.quad(SPhotonsPerTEA, Egap, E_max, full_output=1)[0]  
+    return photons_and_RR0(Egap)[0]  
   
 # Function to calculate radiative recombination rate  
 def RR0(Egap):  
@@ -63,9 +121,7 @@ def RR0(Egap):
     Returns: 
         Recombination rate in m⁻²·s⁻¹ 
     """  
-    integrand = lambda E : E**2 / (np.exp(E / (kB * Tcell)) - 1)  # Planck's law  
-    integral = scipy.integrate.quad(integrand, Egap, E_max, full_output=1)[0]  # Integrate  
-    return ((2 * np.pi) / (c0**2 * hPlanck**3)) * integral  # Prefactor from detailed balance  
+    return photons_and_RR0(Egap)[1]  
   
 # Function to calculate current density  
 def current_density(voltage, Egap):  
@@ -76,7 +132,7 @@ def current_density(voltage, Egap):
     Returns: 
         Current density in A/m² 
     """  
-    return e * (solar_photons_above_gap(Egap) - RR0(Egap) * np.exp(e * voltage / (kB * Tcell)))  
+    return e * (solar_photons_above_gap(Egap) - RR0(Egap) * np.exp(voltage / VT))  
   
 # Short-circuit current (JSC at V=0)  
 def JSC(Egap):  
@@ -84,21 +140,43 @@ def JSC(Egap):
   
 # Open-circuit voltage (voltage when J=0)  
 def VOC(Egap):  
-    return (kB * Tcell / e) * np.log(solar_photons_above_gap(Egap) / RR0(Egap))  
+    return VT * np.log(solar_photons_above_gap(Egap) / RR0(Egap))  
   
-# Optimization function to find maximum power point  
-from scipy.optimize import fmin  
+# Maximum power point condition dP/dV = 0 in the reduced voltage x = eV/kT:  
+# phi = rr0 * exp(x) * (1 + x). With u = 1 + x this is u * exp(u) = e * phi/rr0,  
+# so x = W(e * phi/rr0) - 1 with W the principal branch of the Lambert W function  
+from scipy.special import lambertw  
+  
+def solve_mpp_vec(phi, rr0):  
+    """Solve the maximum power point condition for arrays of integrals. 
+    Args: 
+        phi: Photon flux above bandgap in m⁻²·s⁻¹ 
+        rr0: Radiative recombination rate in m⁻²·s⁻¹ 
+    Returns: 
+        Voltage at maximum power point in V 
+    """  
+    x = lambertw(np.e * phi / rr0).real - 1  
+    return x * VT  
   
-def fmax(func_to_maximize, initial_guess=0):  
-    """Find the argument that maximizes a function. 
+# All photovoltaic parameters from a single pair of integrals (phi, RR0)  
+def metrics(Egap):  
+    """Calculate the photovoltaic parameters at the Shockley-Queisser limit. 
     Args: 
-        func_to_maximize: Function to maximize 
-        initial_guess: Starting point for optimization 
+        Egap: Bandgap energy in eV, scalar or array 
     Returns: 
-        x value that maximizes the function 
+        Dict with Jsc, Voc, Vm, Jm, Pm (A/m², V, V, A/m², W/m²), eff and FF 
     """  
-    func_to_minimize = lambda x : -func_to_maximize(x)  # Convert to minimization  
-    return fmin(func_to_minimize, initial_guess, disp=False)[0]  # Find minimum  
+    if np.ndim(Egap) == 0:  
+        phi, rr0 = photons_and_RR0(Egap)  # Memoized per bandgap  
+    else:  
+        phi, rr0 = photons_and_RR0_vec(Egap)  
+    Jsc = e * (phi - rr0)  
+    Voc = VT * np.log(phi / rr0)  
+    Vm = solve_mpp_vec(phi, rr0)  
+    Jm = e * (phi - rr0 * np.exp(Vm / VT))  
+    Pm = Vm * Jm  
+    return {'Jsc': Jsc, 'Voc': Voc, 'Vm': Vm, 'Jm': Jm, 'Pm': Pm,  
+            'eff': Pm / solar_constant, 'FF': Pm / (Jsc * Voc)}  
   
 # Functions for maximum power point analysis  
 def V_mpp(Egap):  
@@ -108,7 +186,7 @@ def V_mpp(Egap):
     Returns: 
         Voltage in V 
     """  
-    return fmax(lambda voltage : voltage * current_density(voltage, Egap))  
+    return metrics(Egap)['Vm']  
   
 def J_mpp(Egap):  
     """Calculate current density at maximum power point. 
@@ -117,7 +195,7 @@ def J_mpp(Egap):
     Returns: 
         Current density in A/m² 
     """  
-    return current_density(V_mpp(Egap), Egap)  
+    return metrics(Egap)['Jm']  
   
 def max_power(Egap):  
     """Calculate maximum power density. 
@@ -126,8 +204,7 @@ def max_power(Egap):
     Returns: 
         Power density in W/m² 
     """  
-    voltage = V_mpp(Egap)  
-    return voltage * current_density(voltage, Egap)  
+    return metrics(Egap)['Pm']  
   
 def max_efficiency(Egap):  
     """Calculate maximum conversion efficiency. 
@@ -136,7 +213,7 @@ def max_efficiency(Egap):
     Returns: 
         Efficiency as fraction (0-1) 
     """  
-    return max_power(Egap) / solar_constant  
+    return metrics(Egap)['eff']  
   
 # Function to calculate fill factor  
 def fill_factor(Egap):  
@@ -146,14 +223,12 @@ def fill_factor(Egap):
     Returns: 
         Fill factor (0-1) 
     """  
-    return max_power(Egap) / (JSC(Egap) * VOC(Egap))  
+    return metrics(Egap)['FF']  
   
-# Calculate all photovoltaic parameters across bandgap range  
+# Calculate all photovoltaic parameters across bandgap range in one vectorized pass  
 Egap_list = np.linspace(0.4 * eV, 3 * eV, num=100)  
-JSC_list = np.array([JSC(E) for E in Egap_list])  
-VOC_list = np.array([VOC(E) for E in Egap_list])  
-eff_list = np.array([max_efficiency(E) for E in Egap_list])  
-FF_list = np.array([fill_factor(E) for E in Egap_list])  
+sq = metrics(Egap_list)  
+JSC_list, VOC_list, eff_list, FF_list = sq['Jsc'], sq['Voc'], sq['eff'], sq['FF']  
   
 # Save calculated data to text files  
 np.savetxt("eff_list1.txt", eff_list, fmt='%f', delimiter=',')  # Efficiency  
@@ -1,3 +1,5 @@
+import numpy as np  
+
 def calculate_msp(  
     material_costs,          # Dict: Material costs (¥/m²) 
     pce=0.10,                # Power conversion efficiency (default 10%)  
@@ -57,6 +59,49 @@ def calculate_msp(
         "Adjusted Depreciation (¥/m²)": round(adjusted_depreciation, 2)  
     }  
 
+def calculate_msp_vec(  
+    material_sum,            # Total material cost (¥/m²), e.g. sum(material_costs.values())  
+    pce_arr,                 # Array of power conversion efficiencies  
+    throughput_arr,          # Array of production throughputs (m²/min)  
+    # Baseline operational costs (for 3 m²/min throughput)  
+    base_maintenance=2.77,    # Maintenance cost (¥/m²)  
+    base_utilities=22.67,     # Utilities cost (¥/m²)  
+    base_labor=15.36,         # Labor cost (¥/m²)  
+    base_depreciation=13.85,  # Depreciation cost (¥/m²)  
+    sga_percent=0.15,         # SG&A percentage (default 15%)  
+    tax_rate=0.27,            # Tax rate (default 27%)  
+    wacc_percent=0.144,       # WACC (default 14.4%)  
+    cost_type={     # 'fixed' (throughput-independent) or 'variable' (throughput-dependent)  
+        'maintenance': 'fixed',     
+        'utilities': 'variable',    
+        'labor': 'variable',        
+        'depreciation': 'variable'   
+    }  
+):  
+    # Sweep version of calculate_msp: pce_arr and throughput_arr broadcast against each other,  
+    # e.g. pce[:, None] with throughput[None, :] gives a 2-D grid of MSPs in one call  
+    throughput_factor = 3.0 / np.asarray(throughput_arr, dtype=float)  
+      
+    # Split operational costs into fixed and variable parts once; only the variable  
+    # part depends on the sweep axes  
+    base_costs = np.array([base_maintenance, base_utilities, base_labor, base_depreciation])  
+    fixed_mask = np.array([cost_type[k] == 'fixed' for k in ('maintenance', 'utilities', 'labor', 'depreciation')])  
+    fixed_cost = base_costs[fixed_mask].sum()  
+    variable_cost = base_costs[~fixed_mask].sum()  
+      
+    # Calculate direct manufacturing cost (materials + adjusted operational costs)  
+    direct_manufacturing_cost = material_sum + fixed_cost + variable_cost * throughput_factor  
+    # Calculate MSP (per m²) and per watt  
+    denominator = 1 - sga_percent - tax_rate - wacc_percent  
+    msp_per_m2 = direct_manufacturing_cost / denominator if denominator > 0 else np.full_like(direct_manufacturing_cost, np.inf)  
+    msp_per_watt = msp_per_m2 / (1000 * np.asarray(pce_arr, dtype=float))  
+    return {  
+        "MSP (¥/m²)": msp_per_m2,  
+        "MSP (¥/Wp)": msp_per_watt,  
+        "Direct Manufacturing Cost (¥/m²)": direct_manufacturing_cost,  
+        "Throughput Factor": throughput_factor  
+    }  
+
 material_costs_example = {  
     "Barrier foil": 5, # Barrier foil：5 ¥/m²  
     "Glass": 5, # Glass：10 ¥/m²  
@@ -85,3 +130,13 @@ print("MSP Results with Throughput Adjustment:")
 for key, value in result.items():  
     print(f"{key}: {value}")  
 
+# MSP (¥/Wp) over a grid of efficiencies and throughputs in one call  
+pce_grid = np.linspace(0.10, 0.20, 6)  
+throughput_grid = np.array([1.0, 3.0, 5.0, 10.0])  
+msp_grid = calculate_msp_vec(  
+    sum(material_costs_example.values()),  
+    pce_grid[:, None],  
+    throughput_grid[None, :]  
+)["MSP (¥/Wp)"]  
+print("MSP (¥/Wp) grid (rows: PCE, columns: throughput):")  
+print(np.round(msp_grid, 2))  